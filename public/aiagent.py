@@ -42,11 +42,32 @@ SYSTEM_PROMPT_ANALYSE = (
     "Return ONLY valid JSON with this schema:\n"
     "{\n"
     '  "risks": [\n'
-    '    { "clause": "<clause_text>", "reason": "<explanation>" },\n'
+    '    { "section": "<section_heading>", "clause": "<clause_text>", "reason": "<explanation>" },\n'
     "    ...\n"
     "  ],\n"
     '  "improvedVersion": "<improved_contract_text>"\n'
-    "}"
+    "}\n"
+    "In improvedVersion, start every section with '### <section_heading>' on its own line, "
+    "keeping the original section order. "
+    "Use the section headings exactly as given after '### '."
+)
+
+SYSTEM_PROMPT_REVISE = (
+    "You are a senior Indian contract-law expert reviewing a revised contract. "
+    "You are given ONLY the sections that were edited or added since your last review; "
+    "the rest of the contract is unchanged and has already been analysed.\n"
+    "Your tasks:\n"
+    "1. Identify all potentially risky, unfair or fraudulent clauses in these sections.\n"
+    "2. Produce a safer, user-friendly rewrite of each of these sections.\n\n"
+    "Return ONLY valid JSON with this schema:\n"
+    "{\n"
+    '  "risks": [\n'
+    '    { "section": "<section_heading>", "clause": "<clause_text>", "reason": "<explanation>" },\n'
+    "    ...\n"
+    "  ],\n"
+    '  "improvedSections": { "<section_heading>": "<improved_section_text>", ... }\n'
+    "}\n"
+    "Use the section headings exactly as given after '### '."
 )
 
 SYSTEM_PROMPT_CHAT = (
@@ -73,6 +94,22 @@ def analyse_contract_text(text: str) -> str:
     
     return resp.choices[0].message.content.strip()
 
+def analyse_revised_sections(text: str) -> str:
+    """Return JSON string with risks + improvedSections for edited sections only."""
+    client = ChatCompletionsClient(ENDPOINT, AzureKeyCredential(API_KEY))
+    
+    resp = client.complete(
+        model=MODEL_NAME,
+        messages=[
+            SystemMessage(content=SYSTEM_PROMPT_REVISE),
+            UserMessage(content=f"Revised sections follow:\n{text}")
+        ],
+        max_tokens=2048,
+        temperature=0.2
+    )
+    
+    return resp.choices[0].message.content.strip()
+
 def chat_with_agent(history):
     """
     history = list[SystemMessage|UserMessage]
@@ -97,7 +134,11 @@ def json_to_contract_text(path: str) -> str:
     # If file starts with array, take first item
     node = data[0] if isinstance(data, list) else data
     
-    parts = [node.get("Title", "")]
+    return doc_to_contract_text(node)
+
+def doc_to_contract_text(node: dict) -> str:
+    """Convert a single (translated) contract document dict to plain text."""
+    parts = [node.get("Title") or ""]
     
     # Sections is a dict {heading: [lines]}
     sections = node.get("Sections", {})
@@ -6,6 +6,8 @@ PDF → OCR (prebuilt-contract) → Translator → Phi-model analysis → chat
 ---------------------------------------------------------------------
 
 • POST /api/process -> returns {id, analysis}
+• POST /api/revise -> re-analyses only the edited sections of a new
+                      version of a contract against an existing session
 • POST /api/chat -> follows up with the same AI agent
 • GET / -> serves static/index.html
 """
@@ -14,7 +16,7 @@ import uuid
 import json
 import os
 from pathlib import Path
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
@@ -24,9 +26,20 @@ from ocr_contract import ocr_bytes  # bytes → JSON (raw)
 from translator import translate_file  # JSON → JSON (EN)
 from aiagent import (  # JSON → risks + chat
     analyse_contract_text,
+    analyse_revised_sections,
     chat_with_agent,
+    doc_to_contract_text,
     json_to_contract_text,
 )
+from revision import (  # old + new JSON → diff / merged analysis
+    diff_sections,
+    merge_improved_version,
+    merge_risks,
+    sections_aligned,
+    subset_doc,
+    translate_revision,
+    translated_headings,
+)
 
 from azure.ai.inference.models import SystemMessage, UserMessage
 
@@ -56,6 +69,8 @@ app.add_middleware(
 
 # Session storage for chat history
 SESSIONS: dict[str, list] = {}  # {uid: chat-history}
+CONTEXTS: dict[str, list] = {}  # {uid: system + contract + analysis messages}
+REVISING: set[str] = set()  # uids with a /api/revise in flight
 
 # ------------ Pydantic Models ------------------
 
@@ -97,18 +112,181 @@ async def process(pdf: UploadFile = File(...)):
             # If JSON parsing fails, return raw response
             analysis_obj = {"raw_response": analysis_str}
         
+        # Keep the analysis next to the OCR / translation output so that
+        # later revisions can be merged into it (/api/revise)
+        (TMP / f"{uid}_analysis.json").write_text(
+            json.dumps(analysis_obj, indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        
         # 5. Save chat context
-        SESSIONS[uid] = [
+        CONTEXTS[uid] = [
             SystemMessage(content="You are an Indian contract-law expert."),
             UserMessage(content=f"Contract text: {text}"),
             UserMessage(content=f"Analysis: {analysis_str}"),
         ]
+        SESSIONS[uid] = []
         
         return {"id": uid, "analysis": analysis_obj}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/revise")
+async def revise(id: str = Form(...), pdf: UploadFile = File(...)):
+    """Revised PDF: OCR → diff Sections → translate + analyse changed sections only"""
+    if id not in SESSIONS:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    if id in REVISING:
+        raise HTTPException(status_code=409, detail="A revision of this session is already in progress")
+    
+    raw_json = TMP / f"{id}_raw.json"
+    en_json = TMP / f"{id}_en.json"
+    analysis_json = TMP / f"{id}_analysis.json"
+    if not (raw_json.exists() and en_json.exists() and analysis_json.exists()):
+        raise HTTPException(status_code=409, detail="Session has no stored contract to revise")
+    
+    REVISING.add(id)
+    rid = uuid.uuid4().hex[:8]
+    staged = {
+        raw_json: TMP / f"{id}_{rid}_raw.json",
+        en_json: TMP / f"{id}_{rid}_en.json",
+        analysis_json: TMP / f"{id}_{rid}_analysis.json",
+    }
+    
+    try:
+        old_raw = _first_doc(json.loads(raw_json.read_text(encoding="utf-8")))
+        old_en = _first_doc(json.loads(en_json.read_text(encoding="utf-8")))
+        prior = json.loads(analysis_json.read_text(encoding="utf-8"))
+        
+        # 1. OCR the new version → tmp/{id}_{rid}_raw.json
+        pdf_bytes = await pdf.read()
+        ocr_bytes(pdf_bytes, OCR_ENDPOINT, OCR_KEY, staged[raw_json])
+        new_raw = _first_doc(json.loads(staged[raw_json].read_text(encoding="utf-8")))
+        if not new_raw or not new_raw.get("Sections"):
+            raise HTTPException(status_code=422, detail="No contract sections found in the revised PDF")
+        
+        # 2. Clause-level diff on the raw (untranslated) sections
+        diff = diff_sections(old_raw.get("Sections", {}), new_raw["Sections"])
+        edited = diff["changed"] + diff["added"]
+        renamed = diff["renamed"]  # {new heading: old heading}
+        
+        # 3. Translate only what changed, reuse the rest
+        new_en = translate_revision(old_raw, old_en, new_raw, diff)
+        text = doc_to_contract_text(new_en)
+        aligned = sections_aligned(old_raw, old_en) and sections_aligned(new_raw, new_en)
+        
+        # 4. LLM analysis of the edited sections only
+        edited_en = translated_headings(new_raw, new_en, edited)
+        fresh = {"risks": [], "improvedSections": {}}
+        if aligned and edited_en:
+            fresh = _load_analysis(
+                analyse_revised_sections(doc_to_contract_text(subset_doc(new_en, edited_en)))
+            )
+        
+        # 5. Merge with the prior risks + rewrite
+        stale_en = translated_headings(
+            old_raw, old_en, [renamed.get(h, h) for h in diff["changed"]] + diff["removed"]
+        )
+        kept_en = translated_headings(new_raw, new_en, diff["unchanged"])
+        renamed_en = dict(zip(
+            translated_headings(new_raw, new_en, list(renamed)),
+            translated_headings(old_raw, old_en, list(renamed.values())),
+        ))
+        risks = merge_risks(
+            [r for r in prior.get("risks") or [] if isinstance(r, dict)],
+            fresh["risks"],
+            stale_en,
+            list(old_en.get("Sections", {})) + list(new_en.get("Sections", {})),
+            doc_to_contract_text(subset_doc(old_en, stale_en)),
+            doc_to_contract_text(subset_doc(new_en, kept_en)),
+        )
+        
+        prior_improved = prior.get("improvedVersion") or ""
+        if not (edited or diff["removed"] or renamed):
+            improved = prior_improved  # identical resubmission
+        elif aligned:
+            improved = merge_improved_version(
+                prior_improved, new_en, fresh["improvedSections"], edited_en, renamed_en
+            )
+        else:
+            improved = None
+        
+        if improved is not None:
+            analysis_obj = {"risks": risks, "improvedVersion": improved}
+        else:
+            # The draft can't be rebuilt per section (no '### heading' markers
+            # in the prior draft, a section without a rewrite, …): re-analyse
+            # the whole contract rather than pass original clauses off as improved.
+            full = _load_analysis(analyse_contract_text(text), "improvedVersion", str)
+            if full["improvedVersion"].strip():
+                analysis_obj = {"risks": full["risks"], "improvedVersion": full["improvedVersion"]}
+            else:
+                analysis_obj = {
+                    "risks": risks,
+                    "improvedVersion": prior_improved,
+                    "improvedVersionStale": True,
+                }
+                if "raw_response" in full:
+                    analysis_obj["raw_response"] = full["raw_response"]
+        if "raw_response" in fresh:
+            analysis_obj["raw_response"] = fresh["raw_response"]
+        analysis_str = json.dumps(analysis_obj, ensure_ascii=False)
+        
+        # 6. The new version becomes the baseline for the next revision:
+        #    stage every file first, then swap them in together
+        staged[en_json].write_text(
+            json.dumps([new_en], indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        staged[analysis_json].write_text(
+            json.dumps(analysis_obj, indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        for target, tmp in staged.items():
+            tmp.replace(target)
+        
+        # 7. Refresh chat context; the follow-up conversation is kept as is
+        changes = {k: v for k, v in diff.items() if k != "unchanged"}
+        CONTEXTS[id] = [
+            SystemMessage(content="You are an Indian contract-law expert."),
+            UserMessage(content=f"Contract text: {text}"),
+            UserMessage(content=f"Analysis: {analysis_str}"),
+            UserMessage(content=f"The contract was revised. Section changes: {json.dumps(changes, ensure_ascii=False)}"),
+        ]
+        
+        return {"id": id, "analysis": analysis_obj, "changes": changes}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for tmp in staged.values():
+            tmp.unlink(missing_ok=True)
+        REVISING.discard(id)
+
+def _load_analysis(text: str, rewrite_key: str = "improvedSections", rewrite_type: type = dict) -> dict:
+    """
+    Parse an LLM analysis into {"risks": [...], rewrite_key: rewrite_type}.
+    Anything that is not a JSON object of that shape comes back empty,
+    with the model output kept under "raw_response".
+    """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = None
+    
+    if (not isinstance(data, dict)
+            or not isinstance(data.get("risks", []), list)
+            or not isinstance(data.get(rewrite_key), rewrite_type)):
+        return {"risks": [], rewrite_key: rewrite_type(), "raw_response": text}
+    
+    data["risks"] = [r for r in data.get("risks", []) if isinstance(r, dict)]
+    return data
+
+def _first_doc(data):
+    """OCR / translator output is a list of docs – the pipeline uses the first."""
+    return (data[0] if data else {}) if isinstance(data, list) else data
+
 @app.post("/api/chat")
 async def chat(req: ChatReq):
     """Chat with AI agent about the analyzed contract"""
@@ -119,10 +297,10 @@ async def chat(req: ChatReq):
         hist = SESSIONS[req.id]
         hist.append(UserMessage(content=req.message))
         
-        ai_msg = chat_with_agent(hist)
+        ai_msg = chat_with_agent(CONTEXTS[req.id] + hist)
         hist.append(ai_msg)
         
-        # Keep last 12 messages to avoid token limits
+        # Keep last 12 messages to avoid token limits (context is kept apart)
         SESSIONS[req.id] = hist[-12:]
         
         return {"answer": ai_msg.content}
@@ -0,0 +1,272 @@
+"""
+revision.py
+
+Incremental re-analysis of a revised contract against a previous session
+
+-----------------------------------------------------------
+
+1. Clause-level diff of the raw (pre-translation) "Sections" dicts.
+2. Re-translates only the fields / sections that changed or were added.
+3. Merges the partial analysis with the prior risks + improvedVersion.
+
+-----------------------------------------------------------
+"""
+
+import copy
+import difflib
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from translator import translate_doc
+
+# Share of a risk's clause words that must occur in a text to attribute it there
+RISK_OVERLAP = 0.6
+
+# Body similarity (0–1) above which a removed + added section pair is a rename
+RENAME_SIMILARITY = 0.9
+
+# ── Section-level diff ──────────────────────────────────────────────
+
+def diff_sections(old_sections: Dict[str, list], new_sections: Dict[str, list]) -> dict:
+    """
+    Compare two raw Sections dicts {heading: [lines]}.
+    Returns {"changed": [...], "added": [...], "removed": [...], "unchanged": [...],
+    "renamed": {new_heading: old_heading}} where every list holds headings
+    (new-document order, removed in old order).
+
+    A removed + added pair whose bodies are (nearly) the same is a rename, e.g.
+    "5. Payment" → "6. Payment" after a clause was inserted above it. The new
+    heading is then "unchanged" (identical body) or "changed" (small edit)
+    instead of "added", and the old one is not "removed".
+    """
+    result = {"changed": [], "added": [], "removed": [], "unchanged": [], "renamed": {}}
+
+    added = [h for h in new_sections if h not in old_sections]
+    removed = [h for h in old_sections if h not in new_sections]
+    renamed = _pair_renames(old_sections, new_sections, removed, added)
+    result["renamed"] = renamed
+
+    for heading, lines in new_sections.items():
+        old = renamed.get(heading, heading)
+        if old not in old_sections:
+            result["added"].append(heading)
+        elif _normalise_lines(old_sections[old]) != _normalise_lines(lines):
+            result["changed"].append(heading)
+        else:
+            result["unchanged"].append(heading)
+
+    result["removed"] = [h for h in removed if h not in renamed.values()]
+    return result
+
+def _pair_renames(old_sections: Dict[str, list], new_sections: Dict[str, list],
+                  removed: List[str], added: List[str]) -> Dict[str, str]:
+    """Greedily pair added headings with the removed heading of the most similar body."""
+    pairs = {}
+    free = [h for h in removed if _normalise_lines(old_sections[h])]
+    for heading in added:
+        body = "\n".join(_normalise_lines(new_sections[heading]))
+        if not body or not free:
+            continue
+        best = max(free, key=lambda h: _similarity(body, old_sections[h]))
+        if _similarity(body, old_sections[best]) >= RENAME_SIMILARITY:
+            pairs[heading] = best
+            free.remove(best)
+    return pairs
+
+def _similarity(body: str, lines: list) -> float:
+    """difflib ratio between a normalised body and a raw list of lines."""
+    return difflib.SequenceMatcher(None, body, "\n".join(_normalise_lines(lines))).ratio()
+
+def _normalise_lines(lines: list) -> List[str]:
+    """Ignore OCR whitespace noise and empty paragraphs when comparing."""
+    return [re.sub(r"\s+", " ", line).strip() for line in lines if line and line.strip()]
+
+# ── Incremental translation ─────────────────────────────────────────
+
+def sections_aligned(raw: dict, en: dict) -> bool:
+    """
+    Raw and translated headings pair up by position (translate_doc keeps the
+    order); they only fail to when two headings collided during translation.
+    """
+    return len(raw.get("Sections", {})) == len(en.get("Sections", {}))
+
+def translate_revision(old_raw: dict, old_en: dict, new_raw: dict, diff: dict) -> dict:
+    """
+    Build the translated version of `new_raw`, reusing `old_en` for every
+    top-level field and section that is unchanged since the last revision.
+    Renamed sections with an unchanged body only get their heading translated.
+    Only the remaining values are sent to the translator.
+    """
+    # raw heading → (translated heading, translated lines)
+    reuse = {}
+    if sections_aligned(old_raw, old_en):
+        reuse = dict(zip(old_raw.get("Sections", {}), old_en.get("Sections", {}).items()))
+
+    new_sections = new_raw.get("Sections", {})
+    renamed = diff.get("renamed", {})
+
+    def reused(h):
+        return h in diff["unchanged"] and renamed.get(h, h) in reuse
+
+    pending = [h for h in new_sections if not reused(h) or h in renamed]
+
+    # Partial document: changed top-level fields + pending sections only;
+    # renamed sections are sent without their body
+    partial = OrderedDict(
+        (k, copy.deepcopy(v)) for k, v in new_raw.items()
+        if k != "Sections" and (k not in old_raw or old_raw[k] != v or k not in old_en)
+    )
+    partial["Sections"] = OrderedDict(
+        (h, [] if reused(h) else copy.deepcopy(new_sections[h])) for h in pending
+    )
+    translate_doc(partial)
+
+    fresh = dict(zip(pending, partial["Sections"].items()))
+
+    sections = OrderedDict()
+    for h in new_sections:
+        if not reused(h):
+            label, lines = fresh[h]
+        elif h in renamed:
+            label, lines = fresh[h][0], reuse[renamed[h]][1]
+        else:
+            label, lines = reuse[h]
+        sections[label] = lines
+
+    en = OrderedDict()
+    for k in new_raw:
+        en[k] = sections if k == "Sections" else (partial[k] if k in partial else old_en[k])
+    return en
+
+def translated_headings(raw: dict, en: dict, headings: List[str]) -> List[str]:
+    """Map raw section headings to their translated labels in `en` ([] if unaligned)."""
+    if not sections_aligned(raw, en):
+        return []
+    mapping = dict(zip(raw.get("Sections", {}), en.get("Sections", {})))
+    return [mapping[h] for h in headings if h in mapping]
+
+def subset_doc(en: dict, headings: List[str]) -> dict:
+    """Copy of a translated document restricted to the given (translated) headings."""
+    sections = en.get("Sections", {})
+    return {
+        "Title": en.get("Title"),
+        "Sections": OrderedDict((h, sections[h]) for h in headings if h in sections),
+    }
+
+# ── Merging analyses ────────────────────────────────────────────────
+
+def split_improved_version(text: str, headings: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Split an improvedVersion draft on its '### heading' markers.
+    With `headings`, only markers naming one of them start a new block, so
+    sub-headings inside a rewritten section stay part of its body.
+    """
+    known = {_heading_key(h) for h in headings} if headings is not None else None
+    blocks = OrderedDict()
+    current = ""
+    for line in (text or "").splitlines():
+        m = re.match(r"^###\s+(.+?)\s*$", line)
+        if m and (known is None or _heading_key(m.group(1)) in known):
+            current = m.group(1)
+            blocks.setdefault(current, [])
+        else:
+            blocks.setdefault(current, []).append(line)
+    return OrderedDict((h, "\n".join(lines).strip()) for h, lines in blocks.items())
+
+def merge_improved_version(prior: str, en: dict, rewrites: Dict[str, str], edited: List[str],
+                           renamed: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """
+    Rebuild the full improved draft in the new section order.
+    Edited sections take the fresh rewrite; unchanged sections keep their
+    previous rewrite (looked up under the old heading when renamed, given as
+    {new_label: old_label}).
+
+    Returns None when some section has no improved text – e.g. the prior
+    draft has no '### heading' markers or the model skipped a section – so
+    the caller can re-analyse the whole contract instead of passing the
+    original clauses off as the improved version.
+    """
+    renamed = renamed or {}
+    labels = list(en.get("Sections", {})) + list(renamed.values())
+    prior_blocks = {
+        _heading_key(h): body for h, body in split_improved_version(prior, labels).items() if h
+    }
+    edited_keys = {_heading_key(h) for h in edited}
+    fresh = {_heading_key(h): body for h, body in rewrites.items() if isinstance(body, str)}
+
+    parts = [en.get("Title") or ""]
+    for heading in en.get("Sections", {}):
+        key = _heading_key(heading)
+        if key in edited_keys:
+            body = fresh.get(key)
+        else:
+            body = prior_blocks.get(key) or prior_blocks.get(_heading_key(renamed.get(heading, "")))
+        if not body or not body.strip():
+            return None
+        parts.append(f"\n\n### {heading}\n")
+        parts.append(body.strip())
+
+    text = "\n".join(parts)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+def merge_risks(prior: List[dict], fresh: List[dict], stale_sections: List[str],
+                known_sections: List[str], stale_text: str, kept_text: str) -> List[dict]:
+    """
+    Drop prior risks that belong to edited / removed sections, then append
+    the risks found in the re-analysed sections.
+
+    A risk's "section" tag is trusted only when it names one of the
+    `known_sections` (old or new headings); otherwise the risk is attributed
+    by token overlap with the stale vs. unchanged contract text.
+    """
+    stale_keys = {_heading_key(h) for h in stale_sections}
+    known_keys = {_heading_key(h) for h in known_sections} | stale_keys
+    stale_tokens, kept_tokens = _tokens(stale_text), _tokens(kept_text)
+
+    merged = []
+    for risk in prior:
+        if not isinstance(risk, dict):
+            continue
+        section = _heading_key(str(risk.get("section") or ""))
+        if section and section in known_keys:
+            if section in stale_keys:
+                continue
+        else:
+            clause = _tokens(str(risk.get("clause", "")))
+            stale_hit = _overlap(clause, stale_tokens)
+            if stale_hit >= RISK_OVERLAP and stale_hit > _overlap(clause, kept_tokens):
+                continue
+        merged.append(risk)
+
+    seen = {_squash(str(r.get("clause", ""))) for r in merged}
+    for risk in fresh:
+        if not isinstance(risk, dict):
+            continue
+        clause = _squash(str(risk.get("clause", "")))
+        if clause and clause in seen:
+            continue
+        seen.add(clause)
+        merged.append(risk)
+    return merged
+
+def _heading_key(heading: str) -> str:
+    """
+    Match key for section headings. Translated labels look like
+    "Payment (भुगतान)"; the model often echoes only the English part.
+    """
+    heading = re.sub(r"\s*\([^)]*\)\s*$", "", heading or "")
+    return _squash(heading)
+
+def _tokens(text: str) -> set:
+    """Lower-cased word set, used for fuzzy clause matching."""
+    return set(re.findall(r"\w+", text.lower()))
+
+def _overlap(clause: set, text: set) -> float:
+    """Fraction of the clause's words found in the text."""
+    return len(clause & text) / len(clause) if clause else 0.0
+
+def _squash(text: str) -> str:
+    """Case / whitespace-insensitive form used for clause matching."""
+    return re.sub(r"\s+", " ", text).strip().lower()
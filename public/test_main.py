@@ -0,0 +1,233 @@
+"""
+test_main.py
+
+API tests for /api/revise with OCR, Translator and LLM calls stubbed
+
+    cd public && python -m pytest -q
+"""
+
+import importlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import translator
+from azure.ai.inference.models import AssistantMessage, SystemMessage
+
+OLD_DOC = {
+    "Title": "Rent Agreement",
+    "Sections": {
+        "Preamble": ["This agreement is made between A and B."],
+        "1. Payment": ["Rent is payable within 30 days."],
+        "2. Termination": ["Either party may terminate without notice."],
+    },
+}
+
+PRIOR_ANALYSIS = {
+    "risks": [
+        {"section": "EN 1. Payment", "clause": "payable within 30 days", "reason": "short"},
+        {"section": "EN 2. Termination", "clause": "without notice", "reason": "one-sided"},
+    ],
+    "improvedVersion": (
+        "Rent Agreement\n\n### EN Preamble\nSafe preamble\n\n"
+        "### EN 1. Payment\nSafe payment\n\n### EN 2. Termination\nSafe termination"
+    ),
+}
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """main.py app running in an empty tmp dir, with every external service stubbed."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "static").mkdir()
+    (tmp_path / "tmp").mkdir()
+    main = importlib.import_module("main")
+
+    stub = {"ocr": [OLD_DOC], "translated": [], "revise": [], "full": [], "chat": []}
+
+    def fake_ocr(pdf_bytes, endpoint, key, out_json):
+        (tmp_path / out_json).write_text(json.dumps(stub["ocr"]), encoding="utf-8")
+
+    def fake_translate(texts, to_lang="en"):
+        stub["translated"].extend(texts)
+        return [f"EN {t}" for t in texts]
+
+    def fake_revise(text):
+        stub["revise"].append(text)
+        return stub.get("revise_reply", json.dumps({"risks": [], "improvedSections": {}}))
+
+    def fake_full(text):
+        stub["full"].append(text)
+        return stub.get("full_reply", json.dumps(PRIOR_ANALYSIS))
+
+    def fake_chat(history):
+        stub["chat"].append(list(history))
+        return AssistantMessage(content="ok")
+
+    monkeypatch.setattr(main, "ocr_bytes", fake_ocr)
+    monkeypatch.setattr(translator, "translate_texts", fake_translate)
+    monkeypatch.setattr(main, "analyse_revised_sections", fake_revise)
+    monkeypatch.setattr(main, "analyse_contract_text", fake_full)
+    monkeypatch.setattr(main, "chat_with_agent", fake_chat)
+
+    client = TestClient(main.app)
+    resp = client.post("/api/process", files={"pdf": ("c.pdf", b"%PDF", "application/pdf")})
+    assert resp.status_code == 200
+    uid = resp.json()["id"]
+
+    stub["translated"].clear()
+    stub["full"].clear()
+    return main, client, uid, stub, tmp_path / "tmp"
+
+def _revise(client, uid, doc_stub, doc):
+    doc_stub["ocr"] = [doc] if doc is not None else []
+    return client.post(
+        "/api/revise", data={"id": uid}, files={"pdf": ("c.pdf", b"%PDF", "application/pdf")}
+    )
+
+def _baseline(tmp, uid):
+    return {p.name: p.read_bytes() for p in sorted(tmp.glob(f"{uid}_*"))}
+
+# ── errors ──────────────────────────────────────────────────────────
+
+def test_revise_unknown_session_is_404(api):
+    _, client, _, stub, _ = api
+    assert _revise(client, "nope", stub, OLD_DOC).status_code == 404
+
+def test_revise_without_stored_contract_is_409(api):
+    _, client, uid, stub, tmp = api
+    (tmp / f"{uid}_analysis.json").unlink()
+    assert _revise(client, uid, stub, OLD_DOC).status_code == 409
+
+def test_concurrent_revise_of_same_session_is_409(api):
+    main, client, uid, stub, _ = api
+    main.REVISING.add(uid)
+    try:
+        assert _revise(client, uid, stub, OLD_DOC).status_code == 409
+    finally:
+        main.REVISING.discard(uid)
+
+@pytest.mark.parametrize("doc", [None, {"Title": "Blank", "Sections": {}}])
+def test_revise_without_sections_is_422_and_keeps_baseline(api, doc):
+    main, client, uid, stub, tmp = api
+    before = _baseline(tmp, uid)
+
+    assert _revise(client, uid, stub, doc).status_code == 422
+
+    assert _baseline(tmp, uid) == before
+    assert uid not in main.REVISING
+
+# ── incremental re-analysis ─────────────────────────────────────────
+
+def test_identical_resubmission_skips_llm_and_translator(api):
+    _, client, uid, stub, tmp = api
+
+    resp = _revise(client, uid, stub, OLD_DOC)
+
+    assert resp.status_code == 200
+    assert stub["revise"] == stub["full"] == stub["translated"] == []
+    assert resp.json()["analysis"]["improvedVersion"] == PRIOR_ANALYSIS["improvedVersion"]
+    assert len(list(tmp.glob(f"{uid}_*"))) == 3  # staged files cleaned up
+
+def test_edited_section_is_the_only_one_sent_to_the_llm(api):
+    main, client, uid, stub, tmp = api
+    stub["revise_reply"] = json.dumps({
+        "risks": [{"section": "EN 1. Payment", "clause": "within 3 days", "reason": "too short"}],
+        "improvedSections": {"EN 1. Payment": "Rent is due within 30 days."},
+    })
+    doc = json.loads(json.dumps(OLD_DOC))
+    doc["Sections"]["1. Payment"] = ["Rent is payable within 3 days."]
+
+    resp = _revise(client, uid, stub, doc)
+
+    assert resp.status_code == 200
+    [prompt] = stub["revise"]
+    assert "### EN 1. Payment" in prompt
+    assert "Preamble" not in prompt and "Termination" not in prompt
+    assert stub["full"] == []
+    assert stub["translated"] == ["Rent is payable within 3 days.", "1. Payment"]
+
+    analysis = resp.json()["analysis"]
+    assert [r["reason"] for r in analysis["risks"]] == ["one-sided", "too short"]
+    assert "Safe preamble" in analysis["improvedVersion"]
+    assert "Rent is due within 30 days." in analysis["improvedVersion"]
+    assert "Safe payment" not in analysis["improvedVersion"]
+
+    # baseline swapped in, staged files gone, chat context refreshed
+    assert json.loads((tmp / f"{uid}_raw.json").read_text(encoding="utf-8")) == [doc]
+    assert json.loads((tmp / f"{uid}_analysis.json").read_text(encoding="utf-8")) == analysis
+    assert len(list(tmp.glob(f"{uid}_*"))) == 3
+    assert "within 3 days" in main.CONTEXTS[uid][1].content
+
+def test_renumbered_sections_are_not_reanalysed(api):
+    _, client, uid, stub, _ = api
+    stub["revise_reply"] = json.dumps({
+        "risks": [], "improvedSections": {"EN 1. Deposit": "Refundable deposit."},
+    })
+    doc = {
+        "Title": "Rent Agreement",
+        "Sections": {
+            "Preamble": OLD_DOC["Sections"]["Preamble"],
+            "1. Deposit": ["A deposit of two months is due."],
+            "2. Payment": OLD_DOC["Sections"]["1. Payment"],
+            "3. Termination": OLD_DOC["Sections"]["2. Termination"],
+        },
+    }
+
+    resp = _revise(client, uid, stub, doc)
+
+    assert resp.status_code == 200
+    [prompt] = stub["revise"]
+    assert "Deposit" in prompt and "Payment" not in prompt
+    improved = resp.json()["analysis"]["improvedVersion"]
+    assert "### EN 2. Payment (2. Payment)\n\nSafe payment" in improved
+    assert "### EN 3. Termination (3. Termination)\n\nSafe termination" in improved
+
+@pytest.mark.parametrize("reply", ["not json", "[]", json.dumps({"risks": [], "improvedSections": "x"})])
+def test_malformed_section_analysis_falls_back_to_full_analysis(api, reply):
+    _, client, uid, stub, _ = api
+    stub["revise_reply"] = reply
+    stub["full_reply"] = json.dumps({"risks": [], "improvedVersion": "### EN Preamble\nFull rewrite"})
+    doc = json.loads(json.dumps(OLD_DOC))
+    doc["Sections"]["1. Payment"] = ["Rent is payable within 3 days."]
+
+    resp = _revise(client, uid, stub, doc)
+
+    assert resp.status_code == 200
+    assert len(stub["full"]) == 1
+    analysis = resp.json()["analysis"]
+    assert analysis["improvedVersion"] == "### EN Preamble\nFull rewrite"
+    assert analysis["raw_response"] == reply
+
+def test_unsplittable_prior_draft_is_never_replaced_by_original_text(api):
+    _, client, uid, stub, tmp = api
+    prior = {"risks": [], "improvedVersion": "Safer draft: rent due in 30 days, 1 month notice."}
+    (tmp / f"{uid}_analysis.json").write_text(json.dumps(prior), encoding="utf-8")
+    stub["revise_reply"] = json.dumps({"risks": [], "improvedSections": {"EN 1. Payment": "Due in 30 days."}})
+    stub["full_reply"] = "not json"
+    doc = json.loads(json.dumps(OLD_DOC))
+    doc["Sections"]["1. Payment"] = ["Rent is payable within 3 days."]
+
+    analysis = _revise(client, uid, stub, doc).json()["analysis"]
+
+    assert analysis["improvedVersion"] == prior["improvedVersion"]
+    assert analysis["improvedVersionStale"] is True
+
+# ── chat context ────────────────────────────────────────────────────
+
+def test_chat_keeps_revised_context_after_trimming(api):
+    main, client, uid, stub, _ = api
+    doc = json.loads(json.dumps(OLD_DOC))
+    doc["Sections"]["2. Termination"] = ["Either party may terminate with one month notice."]
+    stub["revise_reply"] = json.dumps({
+        "risks": [], "improvedSections": {"EN 2. Termination": "One month notice."},
+    })
+    assert _revise(client, uid, stub, doc).status_code == 200
+
+    for i in range(10):
+        assert client.post("/api/chat", json={"id": uid, "message": f"q{i}"}).status_code == 200
+
+    history = stub["chat"][-1]
+    assert isinstance(history[0], SystemMessage)
+    assert "one month notice" in history[1].content
+    assert len(main.SESSIONS[uid]) == 12
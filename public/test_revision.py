@@ -0,0 +1,224 @@
+"""
+test_revision.py
+
+Unit tests for the incremental re-analysis helpers (revision.py)
+
+    cd public && python -m pytest -q
+"""
+
+import copy
+
+import pytest
+
+import translator
+from revision import (
+    diff_sections,
+    merge_improved_version,
+    merge_risks,
+    split_improved_version,
+    translate_revision,
+    translated_headings,
+)
+
+OLD_RAW = {
+    "Title": "Rent Agreement",
+    "Parties": ["A", "B"],
+    "Sections": {
+        "Preamble": ["This agreement is made between A and B."],
+        "Payment": ["Rent is payable within 30 days."],
+        "Termination": ["Either party may terminate without notice."],
+    },
+}
+
+NEW_RAW = {
+    "Title": "Rent Agreement",
+    "Parties": ["A", "B"],
+    "Sections": {
+        "Preamble": ["This agreement is made between A and B."],
+        "Payment": ["Rent is payable within 7 days."],
+        "Deposit": ["A deposit of two months is due."],
+    },
+}
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Stub the Azure Translator: labels every string and records each batch."""
+    batches = []
+
+    def fake_translate(texts, to_lang="en"):
+        batches.append(list(texts))
+        return [f"EN {t}" for t in texts]
+
+    monkeypatch.setattr(translator, "translate_texts", fake_translate)
+    return batches
+
+@pytest.fixture
+def revision(calls):
+    """Old raw/en docs, new raw doc and their translated revision."""
+    old_en = translator.translate_doc(copy.deepcopy(OLD_RAW))
+    calls.clear()
+    diff = diff_sections(OLD_RAW["Sections"], NEW_RAW["Sections"])
+    new_en = translate_revision(OLD_RAW, old_en, NEW_RAW, diff)
+    return old_en, new_en, diff
+
+# ── diff_sections ───────────────────────────────────────────────────
+
+def test_diff_sections_classifies_every_heading():
+    diff = diff_sections(OLD_RAW["Sections"], NEW_RAW["Sections"])
+    assert diff == {
+        "changed": ["Payment"],
+        "added": ["Deposit"],
+        "removed": ["Termination"],
+        "unchanged": ["Preamble"],
+        "renamed": {},
+    }
+
+def test_diff_sections_ignores_whitespace_noise():
+    old = {"Payment": ["Rent is  payable", ""]}
+    new = {"Payment": [" Rent is payable "]}
+    assert diff_sections(old, new)["unchanged"] == ["Payment"]
+
+def test_diff_sections_pairs_renumbered_headings():
+    old = {"1. Term": ["Eleven months."], "2. Payment": ["Rent is payable within 30 days."]}
+    new = {
+        "1. Term": ["Eleven months."],
+        "2. Deposit": ["A deposit of two months is due."],
+        "3. Payment": ["Rent is payable within 30 days."],
+    }
+    diff = diff_sections(old, new)
+    assert diff["renamed"] == {"3. Payment": "2. Payment"}
+    assert diff["unchanged"] == ["1. Term", "3. Payment"]
+    assert diff["added"] == ["2. Deposit"]
+    assert diff["removed"] == []
+
+def test_diff_sections_renamed_with_small_edit_is_changed():
+    old = {"5. Payment": ["Rent is payable by bank transfer within 30 days of the invoice."]}
+    new = {"6. Payment": ["Rent is payable by bank transfer within 31 days of the invoice."]}
+    diff = diff_sections(old, new)
+    assert diff["renamed"] == {"6. Payment": "5. Payment"}
+    assert diff["changed"] == ["6. Payment"]
+    assert diff["removed"] == diff["added"] == []
+
+# ── translate_revision ──────────────────────────────────────────────
+
+def test_translate_revision_reuses_unchanged_sections(revision, calls):
+    old_en, new_en, _ = revision
+
+    translated = [t for batch in calls for t in batch]
+    assert "This agreement is made between A and B." not in translated
+    assert "Rent Agreement" not in translated
+    assert "Rent is payable within 7 days." in translated
+    assert "A deposit of two months is due." in translated
+
+    assert list(new_en["Sections"]) == ["EN Preamble (Preamble)", "EN Payment (Payment)", "EN Deposit (Deposit)"]
+    assert new_en["Sections"]["EN Preamble (Preamble)"] is old_en["Sections"]["EN Preamble (Preamble)"]
+    assert new_en["Title"] == old_en["Title"]
+
+def test_translate_revision_renamed_section_only_translates_heading(calls):
+    old_raw = {"Sections": {"5. Payment": ["Rent is payable within 30 days."]}}
+    new_raw = {"Sections": {"6. Payment": ["Rent is payable within 30 days."]}}
+    old_en = translator.translate_doc(copy.deepcopy(old_raw))
+    calls.clear()
+
+    new_en = translate_revision(old_raw, old_en, new_raw, diff_sections(old_raw["Sections"], new_raw["Sections"]))
+
+    assert [t for batch in calls for t in batch] == ["6. Payment"]
+    assert new_en["Sections"] == {"EN 6. Payment (6. Payment)": ["EN Rent is payable within 30 days."]}
+
+def test_translated_headings_drops_removed_sections(revision):
+    old_en, new_en, diff = revision
+    assert translated_headings(NEW_RAW, new_en, diff["removed"]) == []
+    assert translated_headings(OLD_RAW, old_en, diff["removed"]) == ["EN Termination (Termination)"]
+
+def test_translated_headings_refuses_unaligned_docs():
+    raw = {"Sections": {"Term": [], "Payment": []}}
+    en = {"Sections": {"Payment": []}}  # two headings collided in translation
+    assert translated_headings(raw, en, ["Payment"]) == []
+
+# ── split_improved_version ──────────────────────────────────────────
+
+def test_split_improved_version_keeps_sub_headings_in_body():
+    text = "### Payment\nBody\n#### 1.1 Sub\nmore\n### Term\nEleven months"
+    assert split_improved_version(text) == {
+        "Payment": "Body\n#### 1.1 Sub\nmore",
+        "Term": "Eleven months",
+    }
+
+def test_split_improved_version_only_splits_on_known_headings():
+    text = "### Payment\nBody\n### Late fees\nmore"
+    assert split_improved_version(text, ["Payment (भुगतान)"]) == {"Payment": "Body\n### Late fees\nmore"}
+
+# ── merge_improved_version ──────────────────────────────────────────
+
+def test_merge_improved_version_without_markers_needs_full_analysis(revision):
+    _, new_en, _ = revision
+    prior = "Safer draft: rent due in 30 days, 1 month notice."
+    assert merge_improved_version(prior, new_en, {}, []) is None
+
+def test_merge_improved_version_edited_section_without_rewrite_needs_full_analysis(revision):
+    _, new_en, _ = revision
+    prior = (
+        "### EN Preamble (Preamble)\nSafe preamble\n\n"
+        "### EN Payment (Payment)\nSafe rewrite of OLD payment clause (30 days)\n\n"
+        "### EN Deposit (Deposit)\nSafe deposit"
+    )
+    assert merge_improved_version(prior, new_en, {}, ["EN Payment (Payment)"]) is None
+
+def test_merge_improved_version_combines_fresh_and_prior_rewrites(revision):
+    _, new_en, _ = revision
+    prior = (
+        "### EN Preamble\nSafe preamble\n\n"
+        "### EN Payment (Payment)\nSafe rewrite of OLD payment clause (30 days)"
+    )
+    rewrites = {"EN Payment": "Rent due in 7 days, with a grace period.", "EN Deposit": "Refundable deposit."}
+
+    merged = merge_improved_version(prior, new_en, rewrites, ["EN Payment (Payment)", "EN Deposit (Deposit)"])
+
+    assert "OLD payment clause" not in merged
+    assert merged.split("### ")[1:] == [
+        "EN Preamble (Preamble)\n\nSafe preamble\n\n",
+        "EN Payment (Payment)\n\nRent due in 7 days, with a grace period.\n\n",
+        "EN Deposit (Deposit)\n\nRefundable deposit.",
+    ]
+
+def test_merge_improved_version_follows_renamed_sections():
+    en = {"Title": "T", "Sections": {"6. Payment": ["Rent in 30 days."]}}
+    merged = merge_improved_version("### 5. Payment\nSafe payment", en, {}, [], {"6. Payment": "5. Payment"})
+    assert merged == "T\n\n### 6. Payment\n\nSafe payment"
+
+# ── merge_risks ─────────────────────────────────────────────────────
+
+def test_merge_risks_drops_tagged_risks_of_removed_section():
+    prior = [
+        {"section": "EN Termination", "clause": "terminate at will", "reason": "one-sided"},
+        {"section": "EN Preamble (Preamble)", "clause": "made between", "reason": "vague"},
+    ]
+    merged = merge_risks(
+        prior, [], ["EN Termination (Termination)"], ["EN Preamble (Preamble)"], "", ""
+    )
+    assert [r["reason"] for r in merged] == ["vague"]
+
+def test_merge_risks_unknown_tag_falls_back_to_overlap():
+    prior = [{"section": "Payment Terms", "clause": "Rent is payable within 30 days.", "reason": "short"}]
+    merged = merge_risks(
+        prior, [], ["Payment"], ["Payment", "Preamble"],
+        "Rent is payable within 30 days.", "This agreement is made between A and B.",
+    )
+    assert merged == []
+
+def test_merge_risks_drops_paraphrased_untagged_stale_risk():
+    prior = [{"clause": "rent payable within 30 days", "reason": "short window"}]
+    fresh = [{"section": "EN Payment", "clause": "payable within 7 days", "reason": "shorter window"}]
+
+    merged = merge_risks(
+        prior, fresh, ["EN Payment (Payment)"], [],
+        "EN Rent is payable within 30 days.",
+        "EN This agreement is made between A and B.",
+    )
+
+    assert [r["reason"] for r in merged] == ["shorter window"]
+
+def test_merge_risks_keeps_unlocatable_risks():
+    prior = [{"clause": "indemnity is unlimited", "reason": "exposure"}]
+    merged = merge_risks(prior, [], [], [], "EN Rent is payable within 30 days.", "")
+    assert merged == prior
@@ -77,6 +77,39 @@ def translate_texts(texts: List[str], to_lang: str = TO_LANG) -> List[str]:
     
     return result
 
+# ── Translate a single document in place ────────────────────────────
+
+def translate_doc(doc: dict) -> dict:
+    """Translate one contract document (values + section headings) in place"""
+    # Step 1: Translate values (title, paragraphs, fields, etc.)
+    values, ptrs = flatten_json(doc)
+    
+    if values:  # Only translate if there are values to translate
+        translated = translate_texts(values)
+        
+        # Update the document with translated values
+        for (parent, key), val in zip(ptrs, translated):
+            parent[key] = val
+    
+    # Step 2: Translate section headings (keys of "Sections" dict)
+    if "Sections" in doc and isinstance(doc["Sections"], dict):
+        original_sections = doc["Sections"]
+        original_keys = list(original_sections.keys())
+        
+        if original_keys:
+            translated_keys = translate_texts(original_keys)
+            
+            # Replace keys with translations
+            new_sections = {}
+            for orig, trans in zip(original_keys, translated_keys):
+                # Keep original in parentheses for reference
+                key_label = f"{trans} ({orig})" if orig != trans else trans
+                new_sections[key_label] = original_sections[orig]
+            
+            doc["Sections"] = new_sections
+    
+    return doc
+
 # ── Main processing pipeline ────────────────────────────────────────
 
 def process_translation(input_file: Path, output_file: Path):
@@ -90,32 +123,7 @@ def process_translation(input_file: Path, output_file: Path):
             docs = [docs]  # Ensure it's a list
         
         for doc in docs:
-            # Step 1: Translate values (title, paragraphs, fields, etc.)
-            values, ptrs = flatten_json(doc)
-            
-            if values:  # Only translate if there are values to translate
-                translated = translate_texts(values)
-                
-                # Update the document with translated values
-                for (parent, key), val in zip(ptrs, translated):
-                    parent[key] = val
-            
-            # Step 2: Translate section headings (keys of "Sections" dict)
-            if "Sections" in doc and isinstance(doc["Sections"], dict):
-                original_sections = doc["Sections"]
-                original_keys = list(original_sections.keys())
-                
-                if original_keys:
-                    translated_keys = translate_texts(original_keys)
-                    
-                    # Replace keys with translations
-                    new_sections = {}
-                    for orig, trans in zip(original_keys, translated_keys):
-                        # Keep original in parentheses for reference
-                        key_label = f"{trans} ({orig})" if orig != trans else trans
-                        new_sections[key_label] = original_sections[orig]
-                    
-                    doc["Sections"] = new_sections
+            translate_doc(doc)
         
         # Write final translated file
         output_file.parent.mkdir(parents=True, exist_ok=True)